@@ -0,0 +1,137 @@
+"""
+Runaway decoding detection for guarded transcription.
+"""
+import zlib
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+def repetition_ratio(text: str, n: int = 3) -> float:
+    """Fraction of word n-grams in text that repeat an earlier n-gram."""
+    words = text.lower().split()
+    if len(words) < n:
+        return 0.0
+
+    ngrams = [tuple(words[i:i + n]) for i in range(len(words) - n + 1)]
+    return 1.0 - len(set(ngrams)) / len(ngrams)
+
+
+def compression_ratio(text: str) -> float:
+    """Compression ratio of text, as computed by Whisper."""
+    text_bytes = text.encode('utf-8')
+    if not text_bytes:
+        return 0.0
+    return len(text_bytes) / len(zlib.compress(text_bytes))
+
+
+def tokens_per_second(segment: Dict, min_duration: float = 1.0) -> float:
+    """Decoded tokens per second of audio covered by a segment."""
+    duration = max(segment['end'] - segment['start'], min_duration)
+    return len(segment.get('tokens', [])) / duration
+
+
+class DecodeGuard:
+    """Watches decoded segments and flags runaway repetitions."""
+
+    def __init__(
+        self,
+        ngram_size: int = 3,
+        max_repetition_ratio: float = 0.5,
+        min_ngrams: int = 8,
+        max_compression_ratio: float = 2.4,
+        min_compression_chars: int = 80,
+        max_tokens_per_second: float = 20.0,
+        history_size: int = 4,
+        min_repeated_segments: int = 4
+    ):
+        """
+        Initialize guard with detection thresholds.
+
+        Args:
+            ngram_size: Word n-gram size used for repetition detection
+            max_repetition_ratio: Repeated n-gram fraction that trips the guard
+            min_ngrams: Minimum n-grams in recent text before checking repetition
+            max_compression_ratio: Compression ratio that trips the guard
+            min_compression_chars: Minimum recent text length before checking compression
+            max_tokens_per_second: Token density per second of audio that trips the guard
+            history_size: Number of recent segments inspected together
+            min_repeated_segments: Segments the repetition must span before it
+                trips the guard, so a chorus sung a couple of times is kept
+        """
+        self.ngram_size = ngram_size
+        self.max_repetition_ratio = max_repetition_ratio
+        self.min_ngrams = min_ngrams
+        self.max_compression_ratio = max_compression_ratio
+        self.min_compression_chars = min_compression_chars
+        self.max_tokens_per_second = max_tokens_per_second
+        self.min_repeated_segments = min(min_repeated_segments, history_size)
+        self.history = deque(maxlen=history_size)
+
+        self.windows_decoded = 0
+        self.windows_aborted = 0
+        self.segments_dropped = 0
+        self.skipped_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.aborted_decode_seconds = 0.0
+
+    def reset(self) -> None:
+        """Forget recent segments, e.g. when starting a new window."""
+        self.history.clear()
+
+    def check_segment(self, segment: Dict) -> Optional[str]:
+        """
+        Check a newly decoded segment against recent ones.
+
+        Args:
+            segment: Whisper segment with 'start', 'end', 'text' and 'tokens'
+
+        Returns:
+            Reason the guard tripped ('repetition', 'compression', 'density'),
+            or None if the segment looks fine
+        """
+        if tokens_per_second(segment) > self.max_tokens_per_second:
+            return 'density'
+
+        self.history.append(segment['text'].strip())
+        recent_text = ' '.join(self.history)
+
+        enough_segments = len(self.history) >= self.min_repeated_segments
+        if enough_segments and len(recent_text.split()) - self.ngram_size + 1 >= self.min_ngrams:
+            if repetition_ratio(recent_text, self.ngram_size) > self.max_repetition_ratio:
+                return 'repetition'
+
+        if len(recent_text) >= self.min_compression_chars:
+            if compression_ratio(recent_text) > self.max_compression_ratio:
+                return 'compression'
+
+        return None
+
+    def filter_window(self, segments: List[Dict]) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        Cut a window's segments at the first one that trips the guard.
+
+        Args:
+            segments: Segments decoded for a single window, in order
+
+        Returns:
+            Tuple of kept segments and the flagged segment info (None if clean)
+        """
+        self.reset()
+        for index, segment in enumerate(segments):
+            reason = self.check_segment(segment)
+            if reason:
+                self.segments_dropped += len(segments) - index
+                return segments[:index], {'start': segment['start'], 'reason': reason}
+        return segments, None
+
+    def stats(self) -> Dict:
+        """Get counters collected so far."""
+        return {
+            'windows_decoded': self.windows_decoded,
+            'windows_aborted': self.windows_aborted,
+            'segments_dropped': self.segments_dropped,
+            'skipped_seconds': round(self.skipped_seconds, 2),
+            'decode_seconds': round(self.decode_seconds, 2),
+            'aborted_decode_seconds': round(self.aborted_decode_seconds, 2),
+            'seconds_per_window': round(self.decode_seconds / max(self.windows_decoded, 1), 2)
+        }
@@ -22,6 +22,7 @@ Exemplos de uso:
   %(prog)s audio.mp3 -o transcricao.txt
   %(prog)s video.mp4 --model large --language pt
   %(prog)s audio.wav --no-timestamps
+  %(prog)s musica.mp3 --guarded
         """
     )
     
@@ -55,6 +56,13 @@ Exemplos de uso:
         help='Não incluir timestamps na transcrição'
     )
     
+    parser.add_argument(
+        '--guarded',
+        action='store_true',
+        help='Interromper trechos com repetições/alucinações em vez de insistir neles '
+             '(cada janela tem só uma nova tentativa, em vez de todas as do Whisper)'
+    )
+    
     parser.add_argument(
         '--version',
         action='version',
@@ -111,7 +119,8 @@ def main():
         result = transcriber.transcribe(
             audio_path,
             language=args.language,
-            include_timestamps=not args.no_timestamps
+            include_timestamps=not args.no_timestamps,
+            guarded=args.guarded
         )
         
         print()
@@ -133,6 +142,16 @@ def main():
         if result.get('language'):
             print(f"Idioma detectado: {result['language']}")
         
+        if result.get('guard_stats'):
+            stats = result['guard_stats']
+            print(f"Janelas decodificadas: {stats['windows_decoded']}")
+            print(f"Janelas interrompidas: {stats['windows_aborted']}")
+            print(f"Segmentos descartados: {stats['segments_dropped']}")
+            print(f"Áudio ignorado: {stats['skipped_seconds']:.1f}s")
+            print(f"Tempo de decodificação: {stats['decode_seconds']:.1f}s "
+                  f"({stats['seconds_per_window']:.1f}s por janela)")
+            print(f"Tempo gasto em janelas interrompidas: {stats['aborted_decode_seconds']:.1f}s")
+        
         file_size = get_file_size_mb(args.input)
         print(f"Tamanho do arquivo: {file_size:.1f} MB")
         
@@ -1,13 +1,27 @@
 """
 Transcription module using OpenAI Whisper.
 """
+import time
 import whisper
 from pathlib import Path
 from typing import Dict, List, Optional
 from tqdm import tqdm
 
+from decode_guard import DecodeGuard
 from utils import format_timestamp, get_file_size_mb, estimate_processing_time
 
+# Guarded mode gives each window one retry instead of Whisper's full fallback chain
+GUARDED_TEMPERATURES = (0.0, 0.2)
+
+# A segment ending this close to the window edge may have been cut by it
+BOUNDARY_TOLERANCE_SECONDS = 1.0
+
+SKIP_REASONS = {
+    'repetition': 'repetição',
+    'compression': 'texto repetitivo',
+    'density': 'densidade anormal de tokens'
+}
+
 
 class Transcriber:
     """Handles audio transcription using Whisper."""
@@ -36,7 +50,9 @@ class Transcriber:
         self, 
         audio_path: Path, 
         language: Optional[str] = None,
-        include_timestamps: bool = True
+        include_timestamps: bool = True,
+        guarded: bool = False,
+        window_seconds: float = 30.0
     ) -> Dict:
         """
         Transcribe audio file.
@@ -45,6 +61,8 @@ class Transcriber:
             audio_path: Path to audio file
             language: Language code (e.g., 'pt', 'en'). Auto-detect if None
             include_timestamps: Whether to include timestamps in output
+            guarded: Decode window by window, cutting off runaway repetitions
+            window_seconds: Window length used in guarded mode
             
         Returns:
             Transcription result dictionary
@@ -71,7 +89,10 @@ class Transcriber:
             # Remove None values
             options = {k: v for k, v in options.items() if v is not None}
             
-            result = self.model.transcribe(str(audio_path), **options)
+            if guarded:
+                result = self._transcribe_guarded(audio_path, options, window_seconds)
+            else:
+                result = self.model.transcribe(str(audio_path), **options)
             
             print("Transcrição concluída!")
             return result
@@ -79,6 +100,116 @@ class Transcriber:
         except Exception as e:
             raise RuntimeError(f"Erro durante transcrição: {e}")
     
+    def _transcribe_guarded(
+        self,
+        audio_path: Path,
+        options: Dict,
+        window_seconds: float
+    ) -> Dict:
+        """
+        Transcribe audio window by window, skipping runaway decodes.
+        
+        Each window is decoded without conditioning on previous text, so a
+        repetition loop cannot spread past its window, and with a short
+        temperature tuple so it gets a single retry instead of Whisper's full
+        fallback chain. When a clean window's trailing segment runs into the
+        window boundary, it is decoded again in the next window, which starts
+        at the end of the segment before it, provided that still advances at
+        least half a window. When a segment trips the guard, it and the rest
+        of its window are dropped, the region is recorded in 'skipped_regions'
+        and decoding resumes after the window.
+        
+        Args:
+            audio_path: Path to audio file
+            options: Whisper transcription options
+            window_seconds: Window length in seconds
+            
+        Returns:
+            Transcription result dictionary with 'skipped_regions' and 'guard_stats'
+        """
+        audio = whisper.load_audio(str(audio_path))
+        sample_rate = whisper.audio.SAMPLE_RATE
+        hop_length = whisper.audio.HOP_LENGTH
+        window_samples = int(window_seconds * sample_rate)
+        
+        guard = DecodeGuard()
+        segments = []
+        skipped_regions = []
+        
+        options = dict(options, temperature=GUARDED_TEMPERATURES, condition_on_previous_text=False)
+        options.pop('verbose', None)
+        
+        offset = 0
+        progress = tqdm(total=len(audio), desc='Transcrevendo', unit='amostra', unit_scale=True)
+        
+        while offset < len(audio):
+            window = audio[offset:offset + window_samples]
+            window_start = offset / sample_rate
+            window_end = window_start + len(window) / sample_rate
+            is_last_window = offset + len(window) >= len(audio)
+            
+            started = time.perf_counter()
+            window_result = self.model.transcribe(window, verbose=None, **options)
+            elapsed = time.perf_counter() - started
+            guard.decode_seconds += elapsed
+            guard.windows_decoded += 1
+            
+            # Reuse the detected language instead of detecting it on every window
+            if 'language' not in options and window_result.get('language'):
+                options['language'] = window_result['language']
+            
+            window_segments = [
+                dict(
+                    segment,
+                    start=segment['start'] + window_start,
+                    end=segment['end'] + window_start,
+                    seek=segment.get('seek', 0) + offset // hop_length
+                )
+                for segment in window_result.get('segments', [])
+            ]
+            kept, flagged = guard.filter_window(window_segments)
+            
+            if flagged:
+                region_start = min(max(flagged['start'], window_start), window_end)
+                guard.windows_aborted += 1
+                guard.aborted_decode_seconds += elapsed
+                guard.skipped_seconds += window_end - region_start
+                skipped_regions.append({
+                    'start': region_start,
+                    'end': window_end,
+                    'reason': flagged['reason']
+                })
+                next_offset = offset + len(window)
+            else:
+                next_offset = offset + len(window)
+                # A trailing segment that reaches the boundary may be cut: decode it again
+                if (
+                    not is_last_window
+                    and len(kept) > 1
+                    and kept[-1]['end'] >= window_end - BOUNDARY_TOLERANCE_SECONDS
+                ):
+                    resume_offset = int(round(kept[-2]['end'] * sample_rate))
+                    if resume_offset - offset >= window_samples // 2:
+                        kept = kept[:-1]
+                        next_offset = resume_offset
+            
+            for segment in kept:
+                segment['id'] = len(segments)
+                segments.append(segment)
+            
+            progress.update(min(next_offset, len(audio)) - offset)
+            offset = next_offset
+        
+        progress.close()
+        
+        return {
+            'text': ''.join(segment['text'] for segment in segments),
+            'segments': segments,
+            'language': options.get('language'),
+            'skipped_regions': skipped_regions,
+            'guard_stats': guard.stats()
+        }
+    
     def format_output(self, result: Dict, include_timestamps: bool = True) -> str:
         """
         Format transcription result for output.
@@ -90,17 +221,25 @@ class Transcriber:
         Returns:
             Formatted transcription text
         """
-        if not result.get('segments'):
+        entries = [
+            (segment['start'], segment['text'].strip())
+            for segment in result.get('segments', [])
+        ]
+        # Mark regions cut off by guarded decoding
+        entries += [
+            (region['start'], f"[trecho ignorado: {SKIP_REASONS.get(region['reason'], region['reason'])}]")
+            for region in result.get('skipped_regions', [])
+        ]
+        
+        if not entries:
             return result.get('text', '').strip()
         
         formatted_lines = []
         
         if include_timestamps:
-            for segment in result['segments']:
-                timestamp = format_timestamp(segment['start'])
-                text = segment['text'].strip()
+            for start, text in sorted(entries, key=lambda entry: entry[0]):
                 if text:
-                    formatted_lines.append(f"{timestamp} {text}")
+                    formatted_lines.append(f"{format_timestamp(start)} {text}")
         else:
             # Combine all text without timestamps
             text = result.get('text', '').strip()
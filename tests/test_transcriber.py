@@ -1,8 +1,11 @@
 """
 Basic tests for the transcription system.
 """
+import sys
+import types
 import unittest
 from pathlib import Path
+from unittest import mock
 import tempfile
 import os
 
@@ -15,6 +18,53 @@ from src.utils import (
     get_file_size_mb
 )
 
+# The transcriber imports its siblings as top-level modules, like main.py does
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+
+def _install_stub(name, **attributes):
+    """Register a lightweight stand-in for an optional heavy dependency."""
+    try:
+        __import__(name)
+    except ImportError:
+        stub = types.ModuleType(name)
+        stub.__dict__.update(attributes)
+        sys.modules[name] = stub
+
+
+class _StubProgress:
+    """Minimal tqdm replacement."""
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def update(self, n):
+        pass
+    
+    def close(self):
+        pass
+
+
+def _unavailable(*args, **kwargs):
+    raise RuntimeError("openai-whisper não instalado")
+
+
+_install_stub(
+    'whisper',
+    audio=types.SimpleNamespace(SAMPLE_RATE=16000, HOP_LENGTH=160),
+    load_audio=_unavailable,
+    load_model=_unavailable
+)
+_install_stub('tqdm', tqdm=_StubProgress)
+
+import transcriber
+from decode_guard import (
+    DecodeGuard,
+    repetition_ratio,
+    compression_ratio,
+    tokens_per_second
+)
+
 
 class TestUtils(unittest.TestCase):
     """Test utility functions."""
@@ -75,5 +125,268 @@ class TestTranscriber(unittest.TestCase):
         self.assertLess(size_mb, 1)  # Should be much less than 1MB
 
 
+class TestDecodeGuard(unittest.TestCase):
+    """Test runaway decoding detection."""
+    
+    def make_segment(self, start, end, text, tokens=10):
+        """Build a minimal Whisper-like segment."""
+        return {'start': start, 'end': end, 'text': text, 'tokens': list(range(tokens))}
+    
+    def test_repetition_ratio(self):
+        """Test repeated n-gram fraction."""
+        self.assertEqual(repetition_ratio("um dois tres quatro cinco"), 0.0)
+        self.assertGreater(repetition_ratio("obrigado por assistir " * 5), 0.5)
+        self.assertEqual(repetition_ratio("curto"), 0.0)
+    
+    def test_compression_ratio(self):
+        """Test compression ratio of repetitive text."""
+        self.assertEqual(compression_ratio(""), 0.0)
+        self.assertGreater(compression_ratio("la la la " * 30), 2.4)
+    
+    def test_tokens_per_second(self):
+        """Test token density with minimum duration."""
+        self.assertEqual(tokens_per_second(self.make_segment(0, 5, "a", tokens=10)), 2.0)
+        self.assertEqual(tokens_per_second(self.make_segment(3, 3, "a", tokens=10)), 10.0)
+    
+    def test_clean_window_is_kept(self):
+        """Test that normal speech passes through untouched."""
+        guard = DecodeGuard()
+        segments = [
+            self.make_segment(0, 4, "Olá, bem-vindos ao nosso podcast."),
+            self.make_segment(4, 8, "Hoje vamos falar sobre tecnologia."),
+            self.make_segment(8, 12, "O tema é bastante interessante.")
+        ]
+        kept, flagged = guard.filter_window(segments)
+        self.assertEqual(kept, segments)
+        self.assertIsNone(flagged)
+        self.assertEqual(guard.segments_dropped, 0)
+    
+    def test_repeated_segments_are_cut(self):
+        """Test that a repetition loop is cut where it trips the guard."""
+        guard = DecodeGuard()
+        segments = [self.make_segment(0, 4, "Hoje vamos falar sobre tecnologia.")]
+        segments += [
+            self.make_segment(4 + i * 2, 6 + i * 2, "Obrigado por assistir o vídeo.")
+            for i in range(5)
+        ]
+        kept, flagged = guard.filter_window(segments)
+        self.assertLess(len(kept), len(segments))
+        self.assertEqual(kept[0], segments[0])
+        self.assertEqual(flagged['reason'], 'repetition')
+        self.assertEqual(guard.segments_dropped, len(segments) - len(kept))
+    
+    def test_dense_segment_is_cut(self):
+        """Test that a segment with too many tokens per second is cut."""
+        guard = DecodeGuard()
+        segments = [
+            self.make_segment(0, 4, "Texto normal."),
+            self.make_segment(4, 5, "Texto denso.", tokens=100)
+        ]
+        kept, flagged = guard.filter_window(segments)
+        self.assertEqual(kept, segments[:1])
+        self.assertEqual(flagged, {'start': 4, 'reason': 'density'})
+    
+    def test_repeated_chorus_is_kept(self):
+        """Test that a chorus line repeated a few times is not cut."""
+        guard = DecodeGuard()
+        segments = [
+            self.make_segment(0, 4, "Na praia ao entardecer"),
+            self.make_segment(4, 7, "eu te amo eu te amo"),
+            self.make_segment(7, 11, "O mar levou meu coração"),
+            self.make_segment(11, 14, "eu te amo eu te amo")
+        ]
+        kept, flagged = guard.filter_window(segments)
+        self.assertEqual(kept, segments)
+        self.assertIsNone(flagged)
+    
+    def test_chorus_back_to_back_is_kept(self):
+        """Test that a chorus sung twice in a row is not cut."""
+        guard = DecodeGuard()
+        segments = [
+            self.make_segment(0, 3, "eu te amo eu te amo"),
+            self.make_segment(3, 6, "eu te amo eu te amo"),
+            self.make_segment(6, 10, "Na praia ao entardecer")
+        ]
+        kept, flagged = guard.filter_window(segments)
+        self.assertEqual(kept, segments)
+        self.assertIsNone(flagged)
+
+
+class StubModel:
+    """Whisper model stand-in returning canned segments per window."""
+    
+    def __init__(self, windows):
+        self.windows = list(windows)
+        self.calls = []
+    
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio), dict(options)))
+        # The last canned window is repeated once the others are used up
+        segments = self.windows.pop(0) if len(self.windows) > 1 else self.windows[0]
+        return {'segments': segments, 'language': 'pt'}
+
+
+class TestGuardedTranscription(unittest.TestCase):
+    """Test guarded window-by-window transcription."""
+    
+    sample_rate = 16000
+    
+    def make_segment(self, start, end, text, tokens=5, seek=0):
+        """Build a minimal Whisper-like segment, relative to its window."""
+        return {'start': start, 'end': end, 'text': text, 'tokens': [1] * tokens, 'seek': seek}
+    
+    def run_guarded(self, windows, audio_seconds):
+        """Run guarded transcription over silent audio with a stub model."""
+        model = StubModel(windows)
+        instance = transcriber.Transcriber.__new__(transcriber.Transcriber)
+        instance.model_size = 'tiny'
+        instance.model = model
+        
+        audio = [0.0] * (audio_seconds * self.sample_rate)
+        with mock.patch.object(transcriber.whisper, 'load_audio', return_value=audio):
+            result = instance._transcribe_guarded(
+                Path('audio.wav'),
+                {'task': 'transcribe', 'verbose': False},
+                30.0
+            )
+        return instance, model, result
+    
+    def loop_segments(self, start, count):
+        """Segments of a repetition loop starting at a window-relative time."""
+        return [
+            self.make_segment(start + i, start + i + 1, " la la la la")
+            for i in range(count)
+        ]
+    
+    def test_clean_windows_advance_to_last_kept_segment(self):
+        """Test that clean windows seek to the end of the last kept segment."""
+        _, model, result = self.run_guarded([
+            [
+                self.make_segment(0, 10, " Primeira frase."),
+                self.make_segment(10, 24, " Segunda frase."),
+                self.make_segment(24, 30, " Frase cortada")
+            ],
+            [
+                self.make_segment(0, 8, " Frase cortada inteira."),
+                self.make_segment(8, 16, " Fim.", seek=800)
+            ]
+        ], audio_seconds=40)
+        
+        # Second window starts at 24s and runs to the end of the audio
+        self.assertEqual(model.calls[1][0], 16 * self.sample_rate)
+        self.assertEqual(
+            [segment['text'] for segment in result['segments']],
+            [" Primeira frase.", " Segunda frase.", " Frase cortada inteira.", " Fim."]
+        )
+        self.assertEqual(result['segments'][2]['start'], 24)
+        self.assertEqual(result['segments'][3]['end'], 40)
+        self.assertEqual(result['segments'][3]['seek'], 800 + 24 * 100)
+        self.assertEqual([segment['id'] for segment in result['segments']], [0, 1, 2, 3])
+        self.assertEqual(result['skipped_regions'], [])
+    
+    def test_early_segments_do_not_cause_small_steps(self):
+        """Test that seeking back never advances less than half a window."""
+        _, model, result = self.run_guarded([[
+            self.make_segment(0, 0.2, " Um."),
+            self.make_segment(0.2, 0.4, " Dois."),
+            self.make_segment(0.4, 30, " Três.")
+        ]], audio_seconds=120)
+        
+        self.assertEqual(len(model.calls), 4)
+        self.assertEqual(len(result['segments']), 12)
+    
+    def test_segment_away_from_boundary_is_kept(self):
+        """Test that a trailing segment ending before the edge is not decoded again."""
+        _, model, result = self.run_guarded([
+            [
+                self.make_segment(0, 10, " Primeira frase."),
+                self.make_segment(10, 20, " Segunda frase.")
+            ],
+            [self.make_segment(0, 5, " Fim.")]
+        ], audio_seconds=40)
+        
+        self.assertEqual(len(model.calls), 2)
+        self.assertEqual(model.calls[1][0], 10 * self.sample_rate)
+        self.assertEqual(
+            [segment['text'] for segment in result['segments']],
+            [" Primeira frase.", " Segunda frase.", " Fim."]
+        )
+    
+    def test_detected_language_is_reused(self):
+        """Test that the language detected in the first window is reused."""
+        _, model, result = self.run_guarded([
+            [self.make_segment(0, 30, " Um.")],
+            [self.make_segment(0, 10, " Dois.")]
+        ], audio_seconds=40)
+        
+        self.assertNotIn('language', model.calls[0][1])
+        self.assertEqual(model.calls[1][1]['language'], 'pt')
+        self.assertEqual(model.calls[1][1]['temperature'], transcriber.GUARDED_TEMPERATURES)
+        self.assertFalse(model.calls[1][1]['condition_on_previous_text'])
+        self.assertEqual(result['language'], 'pt')
+    
+    def test_runaway_window_is_skipped(self):
+        """Test that a tripped window is cut and decoding resumes after it."""
+        _, model, result = self.run_guarded([
+            [self.make_segment(0, 4, " Oi.")] + self.loop_segments(4, 6),
+            [self.make_segment(0, 5, " Depois.")]
+        ], audio_seconds=40)
+        
+        # Second window starts right after the aborted one
+        self.assertEqual(model.calls[1][0], 10 * self.sample_rate)
+        self.assertEqual(len(result['skipped_regions']), 1)
+        region = result['skipped_regions'][0]
+        self.assertEqual(region['reason'], 'repetition')
+        self.assertEqual(region['end'], 30)
+        
+        kept_texts = [segment['text'] for segment in result['segments']]
+        self.assertEqual(kept_texts[0], " Oi.")
+        self.assertEqual(kept_texts[-1], " Depois.")
+        self.assertEqual(result['segments'][-1]['start'], 30)
+        
+        stats = result['guard_stats']
+        self.assertEqual(stats['windows_decoded'], 2)
+        self.assertEqual(stats['windows_aborted'], 1)
+        self.assertEqual(stats['segments_dropped'], 7 - (len(kept_texts) - 1))
+        self.assertEqual(stats['skipped_seconds'], 30 - region['start'])
+    
+    def test_skipped_region_is_clamped_to_window(self):
+        """Test that flagged timestamps past the window are clamped."""
+        _, _, result = self.run_guarded([
+            [self.make_segment(45, 46, " Denso.", tokens=100)]
+        ], audio_seconds=30)
+        
+        self.assertEqual(result['skipped_regions'], [{'start': 30, 'end': 30, 'reason': 'density'}])
+        self.assertEqual(result['guard_stats']['skipped_seconds'], 0)
+    
+    def test_music_only_input_keeps_markers(self):
+        """Test that output lists skipped regions even with no segments."""
+        instance, _, result = self.run_guarded([
+            [self.make_segment(0, 2, " ♪ ♪ ♪", tokens=100)],
+            [self.make_segment(0, 2, " ♪ ♪ ♪", tokens=100)]
+        ], audio_seconds=60)
+        
+        self.assertEqual(result['segments'], [])
+        self.assertEqual(
+            instance.format_output(result).splitlines(),
+            [
+                "[00:00:00] [trecho ignorado: densidade anormal de tokens]",
+                "[00:00:30] [trecho ignorado: densidade anormal de tokens]"
+            ]
+        )
+    
+    def test_marker_is_placed_among_segments(self):
+        """Test that skipped regions are ordered with the segments by time."""
+        instance, _, result = self.run_guarded([
+            [self.make_segment(0, 4, " Oi.")] + self.loop_segments(4, 6),
+            [self.make_segment(0, 5, " Depois.")]
+        ], audio_seconds=40)
+        
+        lines = instance.format_output(result).splitlines()
+        self.assertEqual(lines[0], "[00:00:00] Oi.")
+        self.assertTrue(lines[-2].endswith("[trecho ignorado: repetição]"))
+        self.assertEqual(lines[-1], "[00:00:30] Depois.")
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file